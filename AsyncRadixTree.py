@@ -0,0 +1,161 @@
+import asyncio
+import threading
+
+from RadixTree import RadixTree
+
+
+class AsyncRadixTree:
+    """
+    A facade over RadixTree to be used from an asyncio event loop
+
+    Large traversals do not block the loop: they give the control back to it
+    every yield_every nodes and are moved to an executor once offload_after nodes are visited.
+    Concurrent kids requests of the same string share a single traversal.
+
+    Attributes
+    ----------
+
+    tree: RadixTree
+        the tree the requests are served from
+
+    yield_every: int
+        the number of nodes visited between two returns of the control to the loop
+
+    offload_after: int
+        the number of nodes after which the rest of the traversal runs in the executor,
+        never offloads if None
+
+    executor: concurrent.futures.Executor
+        the executor the traversals are offloaded to, the loop's default one if None
+
+    traversals: int
+        the number of traversals started, the coalesced requests are not counted
+
+    Methods
+    -------
+
+    add(string: str)
+        Adds the given string to the tree, a coroutine
+
+    contains(target: str)
+        :returns True if target is stored in the tree
+
+    kids(target: str)
+        :returns a list of kids of the given string
+    """
+
+    def __init__(self, tree=None, yield_every=1000, offload_after=None, executor=None):
+        """
+        Parameters
+        ----------
+
+        tree: Any
+            A RadixTree to serve or the data to initialize a new one with
+
+        yield_every: int
+            The number of nodes visited between two returns of the control to the loop
+
+        offload_after: int
+            The number of nodes after which the rest of the traversal runs in the executor.
+            Never offloads if None. The traversal holds the GIL, so offloading to threads
+            frees the loop only between the thread switches
+
+        executor: concurrent.futures.Executor
+            The executor the traversals are offloaded to, the loop's default one if None
+        """
+        self.tree = tree if isinstance(tree, RadixTree) else RadixTree(tree)
+        self.yield_every = max(int(yield_every), 1)
+        self.offload_after = offload_after
+        self.executor = executor
+        self.traversals = 0
+        self._pending = {}
+        # held by add and by the offloaded part of a traversal, as add splits a node in several steps
+        self._lock = threading.Lock()
+
+    async def add(self, string):
+        """
+        Adds the input string to the tree, see RadixTree.add.
+        If a traversal running in the executor (or a compaction of the tree) holds the tree,
+        the add waits for it in the executor so the loop is not blocked.
+        The traversals running on the loop see the tree either before or after the add
+
+        :param string: the string to be added to the tree
+        """
+        if self._lock.acquire(blocking=False):
+            try:
+                if not self.tree._lock.locked():
+                    self.tree.add(string)
+                    return
+            finally:
+                self._lock.release()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._add_locked, string)
+
+    def _add_locked(self, string):
+        with self._lock:
+            self.tree.add(string)
+
+    async def contains(self, target):
+        """
+        :param target: a string to be checked
+        :return: True if target is stored in the tree, False otherwise
+        """
+        return target in self.tree
+
+    async def kids(self, target):
+        """
+        Searches for any strings stored in tree that are hierarchically lower
+        than the input string, see RadixTree.kids.
+        Joins the traversal of an identical request if one is running
+
+        :param target: a string the kids of which are required
+        :return: a list of the kids found in the same order as RadixTree.kids
+        """
+        task = self._pending.get(target)
+        if task is None:
+            self.traversals += 1
+            task = asyncio.ensure_future(self._kids(target))
+            self._pending[target] = task
+            task.add_done_callback(lambda _: self._pending.pop(target, None))
+        # shielded so that a cancelled request does not cancel the ones sharing the traversal
+        return list(await asyncio.shield(task))
+
+    async def _kids(self, target):
+        output = []
+        temp_root, closest_kid = self.tree._find_closest(target)
+        if temp_root is None:
+            return output
+
+        stack = [(child, closest_kid) for child in reversed(temp_root.children)]
+        visited = 0
+        while stack:
+            visited += self._search_for_ends(stack, output, self.yield_every)
+            if not stack:
+                break
+            if self.offload_after is not None and visited >= self.offload_after:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.executor, self._search_for_ends_locked, stack, output)
+                break
+            await asyncio.sleep(0)
+        return output
+
+    def _search_for_ends_locked(self, stack, output):
+        with self._lock:
+            self._search_for_ends(stack, output, None)
+
+    @staticmethod
+    def _search_for_ends(stack, output, limit):
+        # an iterative depth first search that pops up to limit nodes (all if None) from the stack,
+        # appends the ends to the output and pushes the children in reversed order to keep them sorted
+        # -------
+        # returns the number of nodes visited
+
+        visited = 0
+        while stack and (limit is None or visited < limit):
+            start, parent = stack.pop()
+            kid = parent + start.value
+            if start.end:
+                output.append(kid)
+            stack.extend((child, kid) for child in reversed(start.children))
+            visited += 1
+        return visited
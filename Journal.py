@@ -0,0 +1,162 @@
+import os
+import re
+
+
+class Journal:
+    """
+    An append-only log of the operations applied to a tree,
+    used to persist a tree incrementally between full exports
+
+    Attributes
+    ----------
+
+    filename: str
+        the path of the log file
+
+    sync_every: int
+        the number of records written between two fsync calls
+
+    Methods
+    -------
+
+    records()
+        yields the operations stored in the log and in the rotated log if any
+
+    append(string)
+        writes an addition record to the log
+
+    flush()
+        forces the written records to the disk
+
+    rotate()
+        moves the records written so far to the rotated log and starts an empty log
+
+    discard_rotated()
+        removes the rotated log once its records are covered by a snapshot
+
+    close()
+        flushes and closes the log file
+    """
+    ADD = '+'
+
+    def __init__(self, filename, sync_every=64):
+        """
+        Opens the log file for appending, creates it if needed.
+        A torn last record left by a crash is cut off first so the next record starts on a fresh line
+
+        Parameters
+        ----------
+
+        filename: str
+            The path of the log file. The rotated log is stored next to it with an '.old' suffix
+
+        sync_every: int
+            The number of records batched between two fsync calls
+        """
+        self.filename = filename
+        self.rotated = filename + '.old'
+        self.sync_every = max(int(sync_every), 1)
+        self._pending = 0
+        for filename in (self.rotated, self.filename):
+            self._truncate_torn(filename)
+        self._file = open(self.filename, 'a', encoding='utf-8', newline='\n')
+
+    def records(self):
+        """
+        Reads the rotated log and then the log itself.
+        A torn last record left by a crash is ignored
+
+        Returns
+        -------
+        generator of tuples (operation, string)
+        """
+        for filename in (self.rotated, self.filename):
+            if not os.path.exists(filename):
+                continue
+            with open(filename, 'rb') as file:
+                lines = file.read().split(b'\n')
+            # the last element is either empty or the torn record
+            for line in lines[:-1]:
+                if not line:
+                    continue
+                line = line.decode('utf-8')
+                yield line[0], self._decode(line[1:])
+
+    def append(self, string):
+        """
+        Writes an addition record, the records are fsynced in batches of sync_every
+
+        Parameters
+        ----------
+
+        string: str
+            the string added to the tree
+        """
+        self._file.write(self.ADD + self._encode(string) + '\n')
+        self._pending += 1
+        if self._pending >= self.sync_every:
+            self.flush()
+
+    def flush(self):
+        """
+        Flushes the buffered records and fsyncs the log
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def rotate(self):
+        """
+        Moves the records written so far to the rotated log and starts an empty log.
+        If the rotated log is still there (a previous compaction did not finish)
+        the records are appended to it instead
+        """
+        self.flush()
+        self._file.close()
+        if not os.path.exists(self.rotated):
+            os.replace(self.filename, self.rotated)
+        else:
+            with open(self.filename, 'rb') as source, open(self.rotated, 'ab') as target:
+                target.write(source.read())
+                target.flush()
+                os.fsync(target.fileno())
+            os.remove(self.filename)
+        self._file = open(self.filename, 'a', encoding='utf-8', newline='\n')
+
+    def discard_rotated(self):
+        """
+        Removes the rotated log, should be called once a snapshot covering it is on the disk
+        """
+        if os.path.exists(self.rotated):
+            os.remove(self.rotated)
+
+    def close(self):
+        """
+        Flushes and closes the log file
+        """
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    @staticmethod
+    def _truncate_torn(filename):
+        # cuts the file back to its last complete record
+        if not os.path.exists(filename):
+            return
+        with open(filename, 'rb+') as file:
+            content = file.read()
+            if content.endswith(b'\n') or not content:
+                return
+            file.truncate(content.rfind(b'\n') + 1)
+            file.flush()
+            os.fsync(file.fileno())
+
+    @staticmethod
+    def _encode(string):
+        # a record takes exactly one line
+        return string.replace('\\', '\\\\').replace('\n', '\\n')
+
+    @staticmethod
+    def _decode(string):
+        return re.sub(r'\\(.)', lambda match: '\n' if match.group(1) == 'n' else match.group(1), string)
@@ -10,7 +10,7 @@ class Node:
         stores the data the Node should contain
 
     children: list
-        stores the list of children Nodes
+        stores the list of children Nodes, kept sorted by their first character
 
     end: bool
         indicates whether the node is the ending of some string
@@ -20,7 +20,13 @@ class Node:
 
     add_node(value)
         creates a new Node object using the input value and
-        appends it to the children's list
+        inserts it to the children's list
+
+    insert_child(node)
+        inserts the node to the children's list keeping it sorted
+
+    child_index(character, right=False)
+        returns the position of the character among the children's first characters
 
     add_indicator(indicator)
         sets children[0] to the indicator value
@@ -56,7 +62,7 @@ class Node:
     def add_node(self, value):
         """
         Initializes a new Node object using value parameter
-        and appends it to the children's list
+        and inserts it to the children's list
 
         Parameters
         ----------
@@ -65,7 +71,48 @@ class Node:
             Any object or value the child-Node should store
         """
         # to add a child of a particular value to self
-        self.children.append(Node(value))
+        self.insert_child(Node(value))
+
+    def insert_child(self, node):
+        """
+        Inserts the node to the children's list so that the children
+        stay sorted by the first character of their values
+
+        Parameters
+        ----------
+
+        node: Node
+            A child-Node to be inserted
+        """
+        self.children.insert(self.child_index(node.value[:1], right=True), node)
+
+    def child_index(self, character, right=False):
+        """
+        Bisects the children by their first characters
+
+        Parameters
+        ----------
+
+        character
+            A single character to be located among the children
+
+        right: bool
+            If True returns the position after the child starting with the character
+
+        Returns
+        -------
+        int: the insertion point of the character
+        """
+        # a plain binary search, bisect supports key= only since python 3.10
+        low, high = 0, len(self.children)
+        while low < high:
+            middle = (low + high) // 2
+            first = self.children[middle].value[:1]
+            if first < character or right and first == character:
+                low = middle + 1
+            else:
+                high = middle
+        return low
 
     def set_ending(self, end):
         """
@@ -94,13 +141,11 @@ class Node:
         Node: a child-Node that has the value as in the value parameter
         False: in case no proper child was found
         """
-        # checking the presence of a given value, in true case return the node desired
-
-        for child in self.children:
-            if value == child.value:
-                return child
-        else:
-            return False
+        # siblings never share the first character, so bisecting on it is enough
+        index = self.child_index(value[:1])
+        if value and index < len(self.children) and self.children[index].value == value:
+            return self.children[index]
+        return False
 
     def child_starts_with(self, value):
         """
@@ -120,8 +165,7 @@ class Node:
 
         """
         # checking the presence of at least one child that starts with given value, return the desired child
-        for child in self.children:
-            if child.value[:len(value)] == value:
-                return child
-        else:
-            return False
+        index = self.child_index(value[:1])
+        if index < len(self.children) and self.children[index].value[:len(value)] == value:
+            return self.children[index]
+        return False
@@ -1,4 +1,8 @@
+import os
+import threading
+
 from Node import *
+from Journal import Journal
 import pandas as pd
 
 
@@ -35,18 +39,46 @@ class RadixTree:
         :returns a list of all possible strings formed by the kids nodes regardless of the fact
         if the string is stored in a tree
 
+    range(lo[Optional]: str, hi[Optional]: str)
+        :returns a generator of the stored strings s with lo <= s < hi in lexicographic order
+
+    floor(key: str), ceiling(key: str)
+        :returns the greatest stored string <= key and the least stored string >= key
+
+    prev_key(key: str), next_key(key: str)
+        :returns the greatest stored string < key and the least stored string > key
+
     export(filename[Optional]: str)
         :returns a list of tuples containing info required to reconstruct the tree via __init__
         saves it as a csv file if a filename is specified
+
+    match(pattern: str)
+        :returns a generator of the stored strings matching the pattern with ?, * and [abc] wildcards
+
+    minimize()
+        merges identical subtrees turning the tree into a read-only directed acyclic word graph
+
+    compact(filename[Optional]: str)
+        saves a snapshot of the tree and drops the journal records it covers
+
+    flush()
+        forces the journal records to the disk
+
+    close()
+        waits for the compaction and closes the journal
     """
 
-    def __init__(self, data=None, from_save=False):
+    def __init__(self, data=None, from_save=False, journal=None, sync_every=64):
         """
         Initializes root as an empty string Node
         and adds each string in data parameter to the tree using
         add_string method. Data can be a single string as well.
         In case from_save is True data should be able to iterate over export file yielding
         parent, value, and end in the end of the tuple.
+        In case journal is specified data has to be the path to the snapshot csv file (from_save is True),
+        which may not exist yet. The records of the journal are replayed on top of the snapshot,
+        every following add is appended to the journal and the journal is compacted
+        to the snapshot (in the background once opened).
 
         Parameters
         ----------
@@ -55,28 +87,53 @@ class RadixTree:
             Any iterable containing strings or a string that should be stored in the Radix Tree
             Or the data required to initialize the tree or the path to a csv file.
 
+        journal: str
+            The path to the write-ahead log file. No journal is kept if None
+
+        sync_every: int
+            The number of journal records batched between two fsync calls
+
         """
 
         self.root = Node('')
-        if data is None:
-            return
+        self.frozen = False
+        self._journal = None
+        self._snapshot = None
+        self._compaction = None
+        self._compaction_error = None
+        # held by add while modifying the tree and by the background compaction while walking it
+        self._lock = threading.Lock()
 
-        if isinstance(data, str) and not from_save:
-            if data == "":
-                return
-            self.add(data)
-            return
+        if journal is not None and not (from_save and isinstance(data, str)):
+            raise ValueError("a journal requires the path to the snapshot csv file as data")
 
         if from_save:
             if isinstance(data, str):
-                data = pd.read_csv(data, index_col='id')
-            self._load(data)
-        else:
+                if journal is not None:
+                    self._snapshot = data
+                if journal is None or os.path.exists(data):
+                    self._load(self._read(data))
+            elif data is not None:
+                self._load(data)
+        elif isinstance(data, str):
+            if data != "":
+                self.add(data)
+        elif data is not None:
             for string in data:
                 if string == "":
                     continue
                 self.add(string)
 
+        if journal is not None:
+            self._journal = Journal(journal, sync_every)
+            replayed = False
+            for operation, string in self._journal.records():
+                if operation == Journal.ADD:
+                    self._add(string)
+                    replayed = True
+            if replayed and self._snapshot is not None:
+                self.compact()
+
     def __len__(self):
         return self._search_for_ends_count(self.root)
 
@@ -155,7 +212,8 @@ class RadixTree:
 
     def add(self, string):
         """
-        Adds the input string to the tree according to the Radix Tree structure
+        Adds the input string to the tree according to the Radix Tree structure.
+        The string is written to the journal first if there is one
 
         Parameter
         ----------
@@ -163,6 +221,14 @@ class RadixTree:
         string: str
             the string to be added to the tree
         """
+        if self.frozen:
+            raise TypeError("a minimized tree can not be modified")
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(string)
+            self._add(string)
+
+    def _add(self, string):
 
         # this function adds each character of the code step by step according to the Radix Tree concept
         # 0 case: perfect fit to a node, set an ending there
@@ -195,13 +261,14 @@ class RadixTree:
                         != string[left_cursor:character+1]:  # handles case 3
                     bottom = Node(val[character - left_cursor:], bool_child.end)
                     bottom.children = bool_child.children
-                    bool_child.children = [bottom,Node(string[character:],True)]
+                    bool_child.children = [bottom]
+                    bool_child.insert_child(Node(string[character:], True))
                     bool_child.value = val[:character - left_cursor]
                     bool_child.end = False
                     return
 
             else:
-                temp_root.children.append(Node(string[left_cursor:], True))  # handles case 1
+                temp_root.insert_child(Node(string[left_cursor:], True))  # handles case 1
                 return
             character += 1
 
@@ -280,28 +347,9 @@ class RadixTree:
         """
 
         output = []
-        closest_kid = ''
-
-        # get down to the last node till there's no more valid children
-        temp_root = self.root
-        character = 1
-        left_cursor = 0
-        found_kid = False
-        while character <= len(target):
-            next_node = temp_root.child(target[left_cursor:character])
-            if next_node:
-                found_kid = True
-                temp_root = next_node
-                closest_kid += target[left_cursor:character]
-                left_cursor = character
-
-            character += 1
-        else:
-            if not found_kid and target != '':
-                return output
-            if left_cursor != len(target):
-                temp_root = temp_root.child_starts_with(target[left_cursor:])
-                closest_kid += temp_root.value
+        temp_root, closest_kid = self._find_closest(target)
+        if temp_root is None:
+            return output
 
         # consider removing
         # if len(closest_kid) > len(target):
@@ -374,28 +422,9 @@ class RadixTree:
         """
 
         output = []
-        closest_kid = ''
-
-        # get down to the last node till there's no more valid children
-        temp_root = self.root
-        character = 1
-        left_cursor = 0
-        found_kid = False
-        while character <= len(target):
-            next_node = temp_root.child(target[left_cursor:character])
-            if next_node:
-                found_kid = True
-                temp_root = next_node
-                closest_kid += target[left_cursor:character]
-                left_cursor = character
-
-            character += 1
-        else:
-            if not found_kid and target != '':
-                return output
-            if left_cursor != len(target):
-                temp_root = temp_root.child_starts_with(target[left_cursor:])
-                closest_kid += temp_root.value
+        temp_root, closest_kid = self._find_closest(target)
+        if temp_root is None:
+            return output
 
         # consider removing
         # if len(closest_kid) > len(target):
@@ -407,6 +436,63 @@ class RadixTree:
 
         return output
 
+    def range(self, lo=None, hi=None):
+        """
+
+        Streams the strings stored in the tree that lie in the half-open
+        interval [lo, hi) in lexicographic order
+
+        Parameter
+        ---------
+
+        lo: str
+            The inclusive lower bound. No lower bound if None
+
+        hi: str
+            The exclusive upper bound. No upper bound if None
+
+        Returns
+        -------
+
+        output: generator of str
+            Yields the strings found in ascending order
+
+        """
+        return self._search_for_ends_in_range(self.root, '', lo, hi)
+
+    def floor(self, key):
+        """
+        :param key: a string to be compared with
+        :return: the greatest stored string less than or equal to key, None if there is no such string
+        """
+        if key in self:
+            return key
+        return self.prev_key(key)
+
+    def ceiling(self, key):
+        """
+        :param key: a string to be compared with
+        :return: the least stored string greater than or equal to key, None if there is no such string
+        """
+        return next(self.range(key), None)
+
+    def prev_key(self, key):
+        """
+        :param key: a string to be compared with
+        :return: the greatest stored string less than key, None if there is no such string
+        """
+        return next(self._search_for_ends_in_range(self.root, '', None, key, reverse=True), None)
+
+    def next_key(self, key):
+        """
+        :param key: a string to be compared with
+        :return: the least stored string greater than key, None if there is no such string
+        """
+        for found in self.range(key):
+            if found != key:
+                return found
+        return None
+
     def export(self, filename=None):
         """
         Outputs the required information to reconstruct a RxTree as a list of tuples.
@@ -426,10 +512,267 @@ class RadixTree:
                 queue.append([child, count])
                 result.append((id_, child.value, int(child.end)))
         if filename:
-            to_save = pd.DataFrame.from_records(result, index='id', columns=['id', 'val', 'end'])
-            to_save.to_csv(filename)
+            self._save(result, filename)
         return result
 
+    def match(self, pattern):
+        """
+
+        Streams the strings stored in the tree that match the pattern in lexicographic order.
+        '?' matches any character, '*' matches any sequence of characters and
+        '[abc]' matches one of the characters listed, ranges as in '[a-z]' and
+        negation as in '[!abc]' are supported. The classes are parsed as in fnmatch:
+        a ']' right after '[' or '[!' is a member and a '[' without the closing ']' is matched literally.
+        The branches the pattern can not match are never visited
+
+        Parameter
+        ---------
+
+        pattern: str
+            The pattern the strings should match
+
+        Returns
+        -------
+
+        output: generator of str
+            Yields the strings found in ascending order
+
+        """
+        tokens = self._compile_pattern(pattern)
+        states = self._pattern_closure(tokens, {0})
+        transitions = {}
+        for child in self.root.children:
+            yield from self._search_for_ends_matching(child, '', tokens, states, transitions)
+
+    def minimize(self):
+        """
+        Merges the identical subtrees so that equal endings of the strings
+        are stored once, which turns the tree into a directed acyclic word graph.
+        The strings stored and the lookups are unaffected but the tree can not be modified afterwards.
+
+        :return: the tree itself
+        """
+        registry = {}
+        with self._lock:
+            self.root.children = [self._merge_equal_subtrees(child, registry) for child in self.root.children]
+            self.frozen = True
+        return self
+
+    def compact(self, filename=None):
+        """
+        Saves a snapshot of the tree as a csv file and drops the journal records it covers.
+        With a journal only the journal rotation is done by the caller, walking the tree
+        and writing the snapshot are done in a background thread. The adds made in the meantime
+        go to a fresh journal, those made during the walk wait for it to finish
+        (about as long as export without a filename). The background thread shares the GIL,
+        so the caller runs slower until the snapshot is written.
+        An error of the previous background compaction is raised here or by close.
+
+        :param filename: a path where to save the snapshot, defaults to the snapshot the tree was opened from.
+            Has to be that snapshot if the tree keeps a journal
+        """
+        if self._journal is None:
+            if filename is None:
+                raise ValueError("no snapshot filename to compact the journal to")
+            self.export(filename)
+            return
+        if filename is not None and filename != self._snapshot:
+            raise ValueError("a journal can only be compacted to the snapshot the tree was opened from")
+        self._wait_for_compaction()
+        with self._lock:
+            self._journal.rotate()
+        self._compaction = threading.Thread(target=self._write_snapshot, args=(self._snapshot,), daemon=True)
+        self._compaction.start()
+
+    def flush(self):
+        """
+        Forces the journal records written so far to the disk
+        """
+        if self._journal is not None:
+            self._journal.flush()
+
+    def close(self):
+        """
+        Waits for the background compaction to finish and closes the journal.
+        Raises the error of the background compaction if it failed
+        """
+        try:
+            self._wait_for_compaction()
+        finally:
+            if self._journal is not None:
+                self._journal.close()
+
+    def _wait_for_compaction(self):
+        # joins the background compaction and raises its error in the calling thread
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+        error, self._compaction_error = self._compaction_error, None
+        if error is not None:
+            raise error
+
+    def _write_snapshot(self, filename):
+        # the snapshot replaces the old one only once it is fully on the disk,
+        # the rotated journal is kept until then so a crash loses nothing.
+        # the snapshot may include adds already in the fresh journal, replaying them is harmless.
+        # runs in the background, the error is kept for _wait_for_compaction
+        temporary = filename + '.tmp'
+        try:
+            with self._lock:
+                result = self.export()
+            with open(temporary, 'w', encoding='utf-8', newline='') as file:
+                self._save(result, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, filename)
+            self._journal.discard_rotated()
+        except Exception as error:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            self._compaction_error = error
+
+    @staticmethod
+    def _save(result, filename):
+        to_save = pd.DataFrame.from_records(result, index='id', columns=['id', 'val', 'end'])
+        to_save.to_csv(filename)
+
+    @staticmethod
+    def _read(filename):
+        # the values are read verbatim, otherwise strings like 'NA' or '007' come back as nan or 7
+        return pd.read_csv(filename, index_col='id', encoding='utf-8',
+                           dtype={'val': str}, keep_default_na=False, na_filter=False)
+
+    def _find_closest(self, target):
+        # gets down to the last node till there's no more valid children,
+        # the kids of target are the ends found below the node returned
+        # -------
+        # returns the node and the string it ends, (None, '') if no string starts with target
+
+        closest_kid = ''
+        temp_root = self.root
+        character = 1
+        left_cursor = 0
+        found_kid = False
+        while character <= len(target):
+            next_node = temp_root.child(target[left_cursor:character])
+            if next_node:
+                found_kid = True
+                temp_root = next_node
+                closest_kid += target[left_cursor:character]
+                left_cursor = character
+
+            character += 1
+        else:
+            if not found_kid and target != '':
+                return None, ''
+            if left_cursor != len(target):
+                temp_root = temp_root.child_starts_with(target[left_cursor:])
+                if not temp_root:
+                    return None, ''
+                closest_kid += temp_root.value
+        return temp_root, closest_kid
+
+    def _search_for_ends_matching(self, start, parent, tokens, states, transitions):
+        # a recurrent generator that feeds the node value to the pattern automaton,
+        # states being the positions in tokens reachable by the characters consumed so far.
+        # the subtree is skipped as soon as no position is reachable.
+        # the steps are cached in transitions, so the automaton is computed once per (states, character)
+
+        for character in start.value:
+            step = (states, character)
+            if step not in transitions:
+                transitions[step] = self._pattern_step(tokens, states, character)
+            states = transitions[step]
+            if not states:
+                return
+        kid = parent + start.value
+        if start.end and len(tokens) in states:
+            yield kid
+        for child in start.children:
+            yield from self._search_for_ends_matching(child, kid, tokens, states, transitions)
+
+    @staticmethod
+    def _compile_pattern(pattern):
+        # splits the pattern into tokens: '*', '?' or a tuple (negated, characters, ranges)
+        # matching a single character, a literal character is a class of its own
+
+        tokens = []
+        position = 0
+        while position < len(pattern):
+            character = pattern[position]
+            position += 1
+            if character in '*?':
+                if character == '*' and tokens and tokens[-1] == '*':
+                    continue
+                tokens.append(character)
+                continue
+            if character == '[':
+                # as in fnmatch a ']' right after '[' or '[!' is a member of the class
+                closing = position
+                if pattern[closing:closing + 1] == '!':
+                    closing += 1
+                if pattern[closing:closing + 1] == ']':
+                    closing += 1
+                closing = pattern.find(']', closing)
+                if closing != -1:
+                    body = pattern[position:closing]
+                    position = closing + 1
+                    negated = body[:1] == '!'
+                    if negated:
+                        body = body[1:]
+                    characters, ranges = set(), []
+                    index = 0
+                    while index < len(body):
+                        if index + 2 < len(body) and body[index + 1] == '-':
+                            ranges.append((body[index], body[index + 2]))
+                            index += 3
+                        else:
+                            characters.add(body[index])
+                            index += 1
+                    tokens.append((negated, frozenset(characters), tuple(ranges)))
+                    continue
+            tokens.append((False, frozenset(character), ()))
+        return tokens
+
+    @staticmethod
+    def _pattern_closure(tokens, states):
+        # a '*' may match nothing, so the position after it is reachable as well
+        closure = set()
+        for state in states:
+            closure.add(state)
+            while state < len(tokens) and tokens[state] == '*':
+                state += 1
+                closure.add(state)
+        return frozenset(closure)
+
+    @staticmethod
+    def _pattern_step(tokens, states, character):
+        # returns the positions reachable after consuming the character
+        reached = set()
+        for state in states:
+            if state == len(tokens):
+                continue
+            token = tokens[state]
+            if token == '*':
+                reached.add(state)
+            elif token == '?':
+                reached.add(state + 1)
+            else:
+                negated, characters, ranges = token
+                found = character in characters or any(low <= character <= high for low, high in ranges)
+                if found != negated:
+                    reached.add(state + 1)
+        return RadixTree._pattern_closure(tokens, reached)
+
+    def _merge_equal_subtrees(self, start, registry):
+        # a recurrent function that replaces the children by their registered equals
+        # and returns the registered equal of the node itself.
+        # the children are merged first, so equal subtrees have equal (value, end, children ids)
+
+        start.children = [self._merge_equal_subtrees(child, registry) for child in start.children]
+        signature = (start.value, start.end, tuple(map(id, start.children)))
+        return registry.setdefault(signature, start)
+
     def _search_for_nodes_values(self, start, parent):
 
         output = []
@@ -455,6 +798,34 @@ class RadixTree:
             output += self._search_for_ends_save_values(child, kid)
         return output
 
+    def _search_for_ends_in_range(self, start, parent, lo, hi, reverse=False):
+        # a recurrent generator that yields the ends of the subtree lying in [lo, hi)
+        # in ascending (or descending if reverse) order.
+        # every string of the subtree starts with kid, so the subtree is skipped entirely
+        # if kid >= hi or if kid < lo while not being a prefix of lo.
+        # the children are sorted, so only those between the next characters of lo and hi are visited
+
+        kid = parent + start.value
+        if hi is not None and kid >= hi:
+            return
+        if lo is not None and kid < lo and not lo.startswith(kid):
+            return
+
+        first, last = 0, len(start.children)
+        if lo is not None and len(lo) > len(kid) and lo.startswith(kid):
+            first = start.child_index(lo[len(kid)])
+        if hi is not None and len(hi) > len(kid) and hi.startswith(kid):
+            last = start.child_index(hi[len(kid)], right=True)
+
+        is_end = start.end and (lo is None or kid >= lo)
+        if is_end and not reverse:
+            yield kid
+        children = start.children[first:last]
+        for child in reversed(children) if reverse else children:
+            yield from self._search_for_ends_in_range(child, kid, lo, hi, reverse)
+        if is_end and reverse:
+            yield kid
+
     def _search_for_ends_count(self, start):
         # a recurrent function that checks if the code can be ended at this point,
         # adds it to the output list and performs the same operations on the heirs
@@ -502,5 +873,5 @@ class RadixTree:
             parent, val, end = int(i[-3]), str(i[-2]), bool(i[-1])
             count += 1
             new = Node(val, end)
-            queue[parent].children.append(new)
+            queue[parent].insert_child(new)
             queue[count] = new
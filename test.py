@@ -1,5 +1,10 @@
 from RadixTree import *
+from AsyncRadixTree import AsyncRadixTree
+import asyncio
+import os
 import random
+import tempfile
+import time
 import numpy as np
 
 import unittest
@@ -120,6 +125,244 @@ class RadixTreeTest(unittest.TestCase):
                           "1", "1123", "123", "123321", "113"])
         self.assertEqual(set(tree),set(RadixTree(tree.export(),1)))
 
+    ###############
+
+    def test_iterate_sorted_1(self):
+        data = ["excitement", "exercise", "expel", "excellent", "extend",
+                "exorbitant", "expense", "expensive", "expose", "exposure",
+                "exude", "exit", "expect", "expectation", "exasperating",
+                "1", "1123", "123", "123321", "113"]
+        self.assertEqual(list(RadixTree(data)), sorted(data))
+
+    def test_RangeFunc_1(self):
+        tree = RadixTree(["excitement", "exercise", "expel", "excellent", "extend",
+                          "exorbitant", "expense", "expensive", "expose", "exposure",
+                          "exude", "exit", "expect", "expectation", "exasperating",
+                          "1", "1123", "123", "123321", "113"])
+        self.assertEqual(list(tree.range("expe", "expo")),
+                         ["expect", "expectation", "expel", "expense", "expensive"])
+
+    def test_RangeFunc_2(self):
+        tree = RadixTree(["excitement", "exercise", "expel", "excellent", "extend",
+                          "exorbitant", "expense", "expensive", "expose", "exposure",
+                          "exude", "exit", "expect", "expectation", "exasperating",
+                          "1", "1123", "123", "123321", "113"])
+        self.assertEqual(list(tree.range("113", "123")), ["113"])
+        self.assertEqual(list(tree.range(hi="113")), ["1", "1123"])
+        self.assertEqual(list(tree.range("exude")), ["exude"])
+
+    def test_FloorCeilingFunc_1(self):
+        tree = RadixTree(["excitement", "exercise", "expel", "excellent", "extend",
+                          "exorbitant", "expense", "expensive", "expose", "exposure",
+                          "exude", "exit", "expect", "expectation", "exasperating",
+                          "1", "1123", "123", "123321", "113"])
+        self.assertEqual(tree.floor("expect"), "expect")
+        self.assertEqual(tree.floor("expectations"), "expectation")
+        self.assertEqual(tree.ceiling("expf"), "expose")
+        self.assertEqual(tree.ceiling("f"), None)
+        self.assertEqual(tree.floor("0"), None)
+
+    def test_NextPrevKeyFunc_1(self):
+        tree = RadixTree(["excitement", "exercise", "expel", "excellent", "extend",
+                          "exorbitant", "expense", "expensive", "expose", "exposure",
+                          "exude", "exit", "expect", "expectation", "exasperating",
+                          "1", "1123", "123", "123321", "113"])
+        self.assertEqual(tree.next_key("expect"), "expectation")
+        self.assertEqual(tree.prev_key("expect"), "exorbitant")
+        self.assertEqual(tree.next_key("exude"), None)
+        self.assertEqual(tree.prev_key("1"), None)
+
+    ###############
+
+    def test_journal_replay_1(self):
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "tree.csv")
+            journal = os.path.join(directory, "tree.log")
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.add_multiple(["mother", "mot", "fuse", "fusing"])
+            tree.flush()
+            # reopened without close as after a crash
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.add("fusion")
+            tree.close()
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.close()
+            self.assertEqual(set(tree), {"mother", "mot", "fuse", "fusing", "fusion"})
+
+    def test_journal_compact_1(self):
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "tree.csv")
+            journal = os.path.join(directory, "tree.log")
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.add_multiple(["expect", "expel"])
+            tree.compact()
+            tree.close()
+            self.assertEqual(os.path.getsize(journal), 0)
+            self.assertEqual(set(RadixTree(snapshot, 1)), {"expect", "expel"})
+            self.assertRaises(ValueError, RadixTree, ["expect"], journal=journal)
+
+    def test_journal_compact_2(self):
+        data = ["NA", "nan", "null", "None", "007", "0071", "1.0", "naïve 中"]
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "tree.csv")
+            journal = os.path.join(directory, "tree.log")
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.add_multiple(data)
+            tree.compact()
+            tree.close()
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.close()
+            self.assertEqual(list(tree), sorted(data))
+
+    def test_journal_torn_record_1(self):
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "tree.csv")
+            journal = os.path.join(directory, "tree.log")
+            with open(journal, "wb") as file:
+                file.write(b"+fuse\n+mother\n+fus")
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.add("zeta")
+            tree.close()
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.close()
+            self.assertEqual(set(tree), {"fuse", "mother", "zeta"})
+
+    def test_journal_torn_record_2(self):
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "tree.csv")
+            journal = os.path.join(directory, "tree.log")
+            with open(journal, "wb") as file:
+                file.write("+fuse\n+café".encode()[:-1])
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.close()
+            self.assertEqual(set(tree), {"fuse"})
+
+    def test_journal_compact_error_1(self):
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "missing", "tree.csv")
+            journal = os.path.join(directory, "tree.log")
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.add("fuse")
+            tree.compact()
+            self.assertRaises(OSError, tree.close)
+            os.mkdir(os.path.dirname(snapshot))
+            tree = RadixTree(snapshot, 1, journal=journal)
+            tree.close()
+            self.assertEqual(set(tree), {"fuse"})
+            self.assertEqual(set(RadixTree(snapshot, 1)), {"fuse"})
+
+    ###############
+
+    def test_minimize_1(self):
+        data = ["walking", "talking", "walked", "talked", "walk", "talk", "sing", "singing"]
+        tree = RadixTree(data).minimize()
+        self.assertEqual(list(tree), sorted(data))
+        self.assertEqual(len(tree), 8)
+        self.assertEqual(set(tree.kids("talk")), {"talked", "talking"})
+        self.assertEqual("walke" in tree, False)
+        self.assertIs(tree.root.child("walk").children[1], tree.root.child("talk").children[1])
+
+    def test_minimize_2(self):
+        tree = RadixTree(["expect", "expel"]).minimize()
+        self.assertRaises(TypeError, tree.add, "expense")
+
+    ###############
+
+    def test_MatchFunc_1(self):
+        tree = RadixTree(["excitement", "exercise", "expel", "excellent", "extend",
+                          "exorbitant", "expense", "expensive", "expose", "exposure",
+                          "exude", "exit", "expect", "expectation", "exasperating",
+                          "1", "1123", "123", "123321", "113"])
+        self.assertEqual(list(tree.match("ex?e*")), ["excellent", "expect", "expectation", "expel",
+                                                     "expense", "expensive", "extend"])
+        self.assertEqual(list(tree.match("*t")), ["excellent", "excitement", "exit", "exorbitant", "expect"])
+        self.assertEqual(list(tree.match("exp[eo]s?")), ["expose"])
+        self.assertEqual(list(tree.match("1[!1]*")), ["123", "123321"])
+        self.assertEqual(list(tree.match("1[0-2]?")), ["113", "123"])
+        self.assertEqual(list(tree.match("ex")), [])
+
+    def test_MatchFunc_2(self):
+        tree = RadixTree(["a]c", "abc", "acc", "^bc", "]x", "ab[", "b"])
+        self.assertEqual(list(tree.match("a[]b]*")), ["a]c", "ab[", "abc"])
+        self.assertEqual(list(tree.match("[^a]b*")), ["^bc", "ab[", "abc"])
+        self.assertEqual(list(tree.match("[!]a]*")), ["^bc", "b"])
+        self.assertEqual(list(tree.match("ab[")), ["ab["])
+        self.assertEqual(list(tree.match("[!]")), [])
+
+
+class AsyncRadixTreeTest(unittest.TestCase):
+    data = ["excitement", "exercise", "expel", "excellent", "extend",
+            "exorbitant", "expense", "expensive", "expose", "exposure",
+            "exude", "exit", "expect", "expectation", "exasperating",
+            "1", "1123", "123", "123321", "113"]
+
+    def test_kids_1(self):
+        tree = AsyncRadixTree(self.data, yield_every=2, offload_after=None)
+        for target in ["", "ex", "exp", "expect", "11", "exq", "2"]:
+            self.assertEqual(asyncio.run(tree.kids(target)), tree.tree.kids(target))
+
+    def test_kids_offload_1(self):
+        tree = AsyncRadixTree(self.data, yield_every=2, offload_after=4)
+        self.assertEqual(asyncio.run(tree.kids("ex")), tree.tree.kids("ex"))
+
+    def test_load_1(self):
+        # a local load generator: many concurrent clients asking for a few prefixes
+        tree = AsyncRadixTree(self.data, yield_every=1, offload_after=6)
+        generator = random.Random(0)
+
+        async def client(target, delay):
+            await asyncio.sleep(delay)
+            return target, await tree.kids(target)
+
+        async def load():
+            return await asyncio.gather(*(client(generator.choice(["", "ex", "exp", "1"]),
+                                                 generator.random() / 1000)
+                                          for _ in range(200)))
+
+        for target, kids in asyncio.run(load()):
+            self.assertEqual(kids, tree.tree.kids(target))
+        self.assertLess(tree.traversals, 200)
+
+    def test_load_2(self):
+        # adds made by the clients while long traversals are offloaded, the loop has to stay responsive
+        data = ["ex" + str(i) for i in range(100000)]
+        tree = AsyncRadixTree(data, yield_every=10, offload_after=10)
+        added = ["expo" + str(i) for i in range(20)]
+        gaps = []
+
+        async def ticker(done):
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.001)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        async def writer():
+            for string in added:
+                await tree.add(string)
+
+        async def load():
+            done = asyncio.Event()
+            ticking = asyncio.ensure_future(ticker(done))
+            readers = [asyncio.ensure_future(tree.kids(prefix)) for prefix in ["ex", "ex1", "ex2", "ex3"]]
+            await asyncio.sleep(0.01)
+            started = time.perf_counter()
+            await writer()
+            writing = time.perf_counter() - started
+            results = await asyncio.gather(*readers)
+            done.set()
+            await ticking
+            return writing, results
+
+        writing, results = asyncio.run(load())
+        stored = set(data) | set(added)
+        for kids in results:
+            self.assertLessEqual(set(kids), stored)
+        # the adds wait for the offloaded traversals, the loop must not wait with them
+        self.assertLess(max(gaps), writing / 2)
+        self.assertEqual(asyncio.run(tree.kids("ex")), tree.tree.kids("ex"))
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=12)